@@ -1,14 +1,19 @@
-from typing import TypedDict, List, Optional
+import asyncio
+import json
+from collections import Counter
+from hashlib import blake2b
+from typing import TypedDict, Dict, List, Optional
 from langgraph.graph import StateGraph, END
-from openai import OpenAI
-from pydantic import BaseModel
+from openai import AsyncOpenAI
 
-from app.models import Ticket, TicketAnalysisCreate
+from app.models import Ticket, TicketAnalysisCreate, TicketClassification
 from app.db import (
     get_tickets_by_ids,
     get_all_tickets,
     create_analysis_run,
     bulk_insert_ticket_analysis,
+    get_cached_classifications,
+    cache_classifications,
 )
 from app.config import settings
 
@@ -17,18 +22,79 @@ from app.config import settings
 # OpenAI Client Setup
 # ============================================================================
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+LLM_MODEL = "gpt-4o-mini"  # Fast and cheap for this task
 
 
 # ============================================================================
-# Structured Output Schemas for LLM
+# Prompt & Response Schema
 # ============================================================================
 
-class TicketClassification(BaseModel):
-    """Structured output from LLM for a single ticket"""
-    category: str  # billing, bug, feature_request, or general
-    priority: str  # high, medium, or low
-    reasoning: str  # Brief explanation of the classification
+# Kept byte-identical across requests, with ticket data only in the user message,
+# so OpenAI's prompt caching can reuse the shared prefix.
+SYSTEM_PROMPT = """You are a support ticket classifier. You will receive a JSON array of tickets, each with an id, title and description.
+For every ticket, provide:
+1. Ticket ID: The id of the ticket being classified
+2. Category: Choose one of: billing, bug, feature_request, general
+3. Priority: Choose one of: high, medium, low
+4. Reasoning: Brief explanation (1-2 sentences)
+
+Classify each ticket independently and return exactly one classification per ticket.
+
+Guidelines:
+- billing: payment, subscription, refund issues
+- bug: errors, crashes, things not working
+- feature_request: new features, enhancements
+- general: everything else
+
+- high: urgent issues affecting production/revenue
+- medium: important but not urgent
+- low: minor issues, nice-to-haves"""
+
+CLASSIFICATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ticket_classifications",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "classifications": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "ticket_id": {
+                                "type": "integer"
+                            },
+                            "category": {
+                                "type": "string",
+                                "enum": ["billing", "bug", "feature_request", "general"]
+                            },
+                            "priority": {
+                                "type": "string",
+                                "enum": ["high", "medium", "low"]
+                            },
+                            "reasoning": {
+                                "type": "string"
+                            }
+                        },
+                        "required": ["ticket_id", "category", "priority", "reasoning"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["classifications"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Mixed into every classification cache key, so changing the model, prompt or
+# schema invalidates classifications cached under the old ones.
+CLASSIFIER_VERSION = blake2b(
+    json.dumps([LLM_MODEL, SYSTEM_PROMPT, CLASSIFICATION_RESPONSE_FORMAT], sort_keys=True).encode("utf-8"),
+    digest_size=8,
+).hexdigest()
 
 
 # ============================================================================
@@ -48,7 +114,9 @@ class AgentState(TypedDict):
 # Node Functions
 # ============================================================================
 
-def fetch_tickets_node(state: AgentState) -> AgentState:
+# Nodes return only the state keys they change; LangGraph merges them into the state.
+
+def fetch_tickets_node(state: AgentState) -> dict:
     """
     Node 1: Fetch tickets from the database.
     If ticket_ids is provided, fetch only those. Otherwise, fetch all.
@@ -60,87 +128,127 @@ def fetch_tickets_node(state: AgentState) -> AgentState:
     else:
         tickets = get_all_tickets()
     
-    return {
-        **state,
-        "tickets": tickets,
-    }
+    return {"tickets": tickets}
 
 
-def classify_ticket_with_llm(ticket: Ticket) -> TicketClassification:
+def ticket_text_hash(ticket: Ticket) -> bytes:
+    """
+    Hash a ticket's title and description into the classification cache key.
+    The classification depends only on this text (and CLASSIFIER_VERSION), not on the ticket's ID.
     """
-    Use OpenAI to classify a single ticket with structured outputs.
+    text = f"{CLASSIFIER_VERSION}\x00{ticket.title}\x00{ticket.description}"
+    return blake2b(text.encode("utf-8"), digest_size=32).digest()
+
+
+async def classify_ticket_batch_with_llm(
+    client: AsyncOpenAI, tickets: List[Ticket]
+) -> Dict[int, TicketClassification]:
     """
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",  # Fast and cheap for this task
+    Use OpenAI to classify a batch of tickets in a single request with structured outputs.
+    Returns classifications keyed by ticket ID.
+    """
+    response = await client.chat.completions.create(
+        model=LLM_MODEL,
         messages=[
             {
                 "role": "system",
-                "content": """You are a support ticket classifier. Analyze the ticket and provide:
-1. Category: Choose one of: billing, bug, feature_request, general
-2. Priority: Choose one of: high, medium, low
-3. Reasoning: Brief explanation (1-2 sentences)
-
-Guidelines:
-- billing: payment, subscription, refund issues
-- bug: errors, crashes, things not working
-- feature_request: new features, enhancements
-- general: everything else
-
-- high: urgent issues affecting production/revenue
-- medium: important but not urgent
-- low: minor issues, nice-to-haves"""
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
-                "content": f"Title: {ticket.title}\n\nDescription: {ticket.description}"
+                "content": json.dumps([
+                    {"id": ticket.id, "title": ticket.title, "description": ticket.description}
+                    for ticket in tickets
+                ])
             }
         ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "ticket_classification",
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "category": {
-                            "type": "string",
-                            "enum": ["billing", "bug", "feature_request", "general"]
-                        },
-                        "priority": {
-                            "type": "string",
-                            "enum": ["high", "medium", "low"]
-                        },
-                        "reasoning": {
-                            "type": "string"
-                        }
-                    },
-                    "required": ["category", "priority", "reasoning"],
-                    "additionalProperties": False
-                }
-            }
-        },
+        response_format=CLASSIFICATION_RESPONSE_FORMAT,
         temperature=0.3,
     )
     
-    # Parse the structured response
-    import json
+    # Parse the structured response, ignoring any IDs that were not requested
     result = response.choices[0].message.content
-    classification_dict = json.loads(result)
-    return TicketClassification(**classification_dict)
+    requested_ids = {ticket.id for ticket in tickets}
+    return {
+        item["ticket_id"]: TicketClassification(
+            category=item["category"],
+            priority=item["priority"],
+            reasoning=item["reasoning"],
+        )
+        for item in json.loads(result)["classifications"]
+        if item["ticket_id"] in requested_ids
+    }
 
 
-def analyze_tickets_node(state: AgentState) -> AgentState:
+async def classify_tickets_with_llm(tickets: List[Ticket]) -> List[TicketClassification]:
+    """
+    Classify tickets in batches of LLM_BATCH_SIZE, keeping at most LLM_CONCURRENCY
+    requests in flight. Results are returned in the same order as the input tickets.
+    """
+    # Created per call: the client and semaphore are bound to the running event loop
+    semaphore = asyncio.Semaphore(settings.LLM_CONCURRENCY)
+    batch_size = settings.LLM_BATCH_SIZE
+    
+    async with AsyncOpenAI(api_key=settings.OPENAI_API_KEY) as client:
+        async def classify(batch: List[Ticket]) -> Dict[int, TicketClassification]:
+            async with semaphore:
+                return await classify_ticket_batch_with_llm(client, batch)
+        
+        async def classify_all(pending: List[Ticket]) -> Dict[int, TicketClassification]:
+            classifications = {}
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            # A TaskGroup cancels the remaining batches as soon as one fails, so no
+            # request is left running against a client that is about to be closed
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [tg.create_task(classify(batch)) for batch in batches]
+            except ExceptionGroup as eg:
+                # Surface the first failure itself rather than a group chained to it
+                raise eg.exceptions[0] from None
+            for task in tasks:
+                classifications.update(task.result())
+            return classifications
+        
+        classifications = await classify_all(tickets)
+        
+        # The model occasionally drops a ticket from a batch; ask again once for those
+        missing = [ticket for ticket in tickets if ticket.id not in classifications]
+        if missing:
+            classifications.update(await classify_all(missing))
+    
+    missing_ids = [ticket.id for ticket in tickets if ticket.id not in classifications]
+    if missing_ids:
+        raise ValueError(f"LLM returned no classification for ticket(s): {missing_ids}")
+    
+    return [classifications[ticket.id] for ticket in tickets]
+
+
+def analyze_tickets_node(state: AgentState) -> dict:
     """
     Node 2: Analyze each ticket using OpenAI LLM with structured outputs.
+    Tickets whose text was classified before are served from the classification
+    cache; the rest are sent to the LLM in concurrent multi-ticket batches.
     """
     tickets = state["tickets"]
     analyses = []
     
-    for ticket in tickets:
-        # Classify using LLM
-        classification = classify_ticket_with_llm(ticket)
-        
+    # Look up previously classified ticket texts
+    text_hashes = [ticket_text_hash(ticket) for ticket in tickets]
+    classifications_by_hash = get_cached_classifications(text_hashes)
+    
+    # Classify each distinct uncached text once using LLM and remember the results
+    misses = {}
+    for text_hash, ticket in zip(text_hashes, tickets):
+        if text_hash not in classifications_by_hash:
+            misses.setdefault(text_hash, ticket)
+    if misses:
+        fresh = asyncio.run(classify_tickets_with_llm(list(misses.values())))
+        fresh_by_hash = dict(zip(misses.keys(), fresh))
+        cache_classifications(fresh_by_hash)
+        classifications_by_hash.update(fresh_by_hash)
+    
+    for ticket, text_hash in zip(tickets, text_hashes):
+        classification = classifications_by_hash[text_hash]
         analyses.append(
             TicketAnalysisCreate(
                 analysis_run_id=0,  # Will be updated in save_results_node
@@ -153,30 +261,24 @@ def analyze_tickets_node(state: AgentState) -> AgentState:
     
     # Generate overall summary
     total = len(tickets)
-    high_priority = sum(1 for a in analyses if a.priority == "high")
-    medium_priority = sum(1 for a in analyses if a.priority == "medium")
-    low_priority = sum(1 for a in analyses if a.priority == "low")
-    
-    categories = {}
-    for a in analyses:
-        categories[a.category] = categories.get(a.category, 0) + 1
+    priorities = Counter(a.priority for a in analyses)
+    categories = Counter(a.category for a in analyses)
     
     category_summary = ", ".join(f"{count} {cat}" for cat, count in sorted(categories.items()))
     
     summary = (
         f"Analyzed {total} ticket(s). "
-        f"Priority breakdown: {high_priority} high, {medium_priority} medium, {low_priority} low. "
+        f"Priority breakdown: {priorities['high']} high, {priorities['medium']} medium, {priorities['low']} low. "
         f"Categories: {category_summary}."
     )
     
     return {
-        **state,
         "summary": summary,
         "analyses": analyses,
     }
 
 
-def save_results_node(state: AgentState) -> AgentState:
+def save_results_node(state: AgentState) -> dict:
     """
     Node 3: Save the analysis results to the database.
     Creates an analysis_run record and inserts all ticket analyses.
@@ -194,10 +296,7 @@ def save_results_node(state: AgentState) -> AgentState:
     # Bulk insert all ticket analyses
     bulk_insert_ticket_analysis(analyses)
     
-    return {
-        **state,
-        "run_id": analysis_run.id,
-    }
+    return {"run_id": analysis_run.id}
 
 
 # ============================================================================
@@ -209,6 +308,9 @@ def create_analysis_graph():
     Build the LangGraph state graph for ticket analysis.
     
     Flow: fetch_tickets -> analyze_tickets -> save_results -> END
+    
+    run_agent mirrors this flow directly when AGENT_FAST_PATH is enabled,
+    so keep the two in sync when adding nodes or branches.
     """
     workflow = StateGraph(AgentState)
     
@@ -257,8 +359,15 @@ def run_agent(ticket_ids: Optional[List[int]] = None) -> dict:
         "analyses": [],
     }
     
-    # Run the graph
-    final_state = analysis_graph.invoke(initial_state)
+    if settings.AGENT_FAST_PATH:
+        # The graph is a fixed linear flow, so call its nodes in order directly
+        # and skip LangGraph's per-step validation and channel bookkeeping
+        final_state = dict(initial_state)
+        for node in (fetch_tickets_node, analyze_tickets_node, save_results_node):
+            final_state.update(node(final_state))
+    else:
+        # Run the graph
+        final_state = analysis_graph.invoke(initial_state)
     
     return {
         "run_id": final_state["run_id"],
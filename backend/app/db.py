@@ -1,5 +1,9 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from psycopg2.extensions import connection
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -10,89 +14,161 @@ from app.models import (
     AnalysisRun,
     TicketAnalysis,
     TicketAnalysisCreate,
+    TicketClassification,
     TicketWithAnalysis,
     LatestAnalysisResponse,
 )
 
 
-def get_db_connection():
-    """Create a new database connection"""
-    return psycopg2.connect(
-        settings.DATABASE_URL,
-        cursor_factory=RealDictCursor  # Returns rows as dicts
-    )
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """
+    Shared connection pool, so requests don't pay connection setup on every query.
+    Created on first use so importing this module never touches the database; the
+    lock stops concurrent first requests from each opening a pool.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    settings.DB_POOL_MIN_CONN,
+                    settings.DB_POOL_MAX_CONN,
+                    settings.DATABASE_URL,
+                    cursor_factory=RealDictCursor  # Returns rows as dicts
+                )
+    return _pool
+
+
+# ThreadedConnectionPool raises PoolError instead of waiting when every connection is
+# checked out, and FastAPI runs sync endpoints on more threads than DB_POOL_MAX_CONN.
+# Callers block on this semaphore until a connection is free.
+_pool_slots = threading.BoundedSemaphore(settings.DB_POOL_MAX_CONN)
+
+
+# Connection injected by the test suite. When set, get_conn() runs each call in a
+# SAVEPOINT on it instead of a pooled transaction, so tests can roll everything back.
+_override_conn: ContextVar[Optional[connection]] = ContextVar("_override_conn", default=None)
+
+
+@contextmanager
+def use_connection(conn: connection):
+    """Route every helper in this module through conn until the block exits"""
+    token = _override_conn.set(conn)
+    try:
+        yield conn
+    finally:
+        _override_conn.reset(token)
+
+
+@contextmanager
+def get_conn():
+    """
+    Borrow a connection from the pool for one transaction, waiting if none is free.
+    Commits on success, rolls back on error, and always returns the connection.
+    Inside use_connection(), the block runs in a SAVEPOINT on that connection instead.
+    """
+    override = _override_conn.get()
+    if override is not None:
+        with _savepoint(override):
+            yield override
+        return
+    
+    pool = _get_pool()
+    with _pool_slots:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            # A dropped connection can't be rolled back; putconn() discards it
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+
+@contextmanager
+def _savepoint(conn: connection):
+    """Run a block inside a SAVEPOINT, releasing it on success and rolling back to it on error"""
+    with conn.cursor() as cur:
+        cur.execute("SAVEPOINT db_call")
+    try:
+        yield
+    except Exception:
+        with conn.cursor() as cur:
+            cur.execute("ROLLBACK TO SAVEPOINT db_call")
+        raise
+    with conn.cursor() as cur:
+        cur.execute("RELEASE SAVEPOINT db_call")
+
+
+def close_pool():
+    """Close all pooled connections (called on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
 
 
 # ============================================================================
 # Ticket Operations
 # ============================================================================
 
+# Rows read back from Postgres already match the schema types, so the helpers below
+# build models with model_construct() to skip per-row Pydantic validation.
+
 def insert_tickets(tickets: List[TicketCreate]) -> List[Ticket]:
-    """Insert multiple tickets and return them with IDs"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+    """Insert multiple tickets in a single multi-row INSERT and return them with IDs"""
+    if not tickets:
+        return []
     
-    inserted = []
-    try:
-        for ticket in tickets:
-            cur.execute(
-                """
-                INSERT INTO tickets (title, description, created_at)
-                VALUES (%s, %s, NOW())
-                RETURNING id, title, description, created_at
-                """,
-                (ticket.title, ticket.description)
-            )
-            row = cur.fetchone()
-            inserted.append(Ticket(**row))
-        
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    with get_conn() as conn, conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO tickets (title, description, created_at)
+            VALUES %s
+            RETURNING id, title, description, created_at
+            """,
+            [(ticket.title, ticket.description) for ticket in tickets],
+            template="(%s, %s, NOW())",
+            page_size=1000,
+            fetch=True,
+        )
     
-    return inserted
+    return [Ticket.model_construct(**row) for row in rows]
 
 
 def get_all_tickets() -> List[Ticket]:
     """Fetch all tickets from the database"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            "SELECT id, title, description, created_at FROM tickets ORDER BY created_at DESC"
+            "SELECT id, title, description, created_at FROM tickets ORDER BY created_at DESC, id DESC"
         )
         rows = cur.fetchall()
-        return [Ticket(**row) for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+        return [Ticket.model_construct(**row) for row in rows]
 
 
 def get_tickets_by_ids(ticket_ids: List[int]) -> List[Ticket]:
     """Fetch specific tickets by their IDs"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
-            SELECT id, title, description, created_at 
-            FROM tickets 
+            SELECT id, title, description, created_at
+            FROM tickets
             WHERE id = ANY(%s)
             ORDER BY created_at DESC
             """,
             (ticket_ids,)
         )
         rows = cur.fetchall()
-        return [Ticket(**row) for row in rows]
-    finally:
-        cur.close()
-        conn.close()
+        return [Ticket.model_construct(**row) for row in rows]
 
 
 # ============================================================================
@@ -101,10 +177,7 @@ def get_tickets_by_ids(ticket_ids: List[int]) -> List[Ticket]:
 
 def create_analysis_run(summary: str) -> AnalysisRun:
     """Create a new analysis run and return it"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
             INSERT INTO analysis_runs (summary, created_at)
@@ -114,14 +187,8 @@ def create_analysis_run(summary: str) -> AnalysisRun:
             (summary,)
         )
         row = cur.fetchone()
-        conn.commit()
-        return AnalysisRun(**row)
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    
+    return AnalysisRun.model_construct(**row)
 
 
 # ============================================================================
@@ -136,10 +203,7 @@ def insert_ticket_analysis(
     notes: Optional[str] = None
 ) -> TicketAnalysis:
     """Insert a ticket analysis result"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
+    with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
             """
             INSERT INTO ticket_analysis (analysis_run_id, ticket_id, category, priority, notes)
@@ -149,30 +213,24 @@ def insert_ticket_analysis(
             (analysis_run_id, ticket_id, category, priority, notes)
         )
         row = cur.fetchone()
-        conn.commit()
-        return TicketAnalysis(**row)
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+    
+    return TicketAnalysis.model_construct(**row)
 
 
 def bulk_insert_ticket_analysis(analyses: List[TicketAnalysisCreate]) -> List[TicketAnalysis]:
-    """Insert multiple ticket analyses in a single transaction"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+    """Insert multiple ticket analyses in a single multi-row INSERT"""
+    if not analyses:
+        return []
     
-    inserted = []
-    try:
-        for analysis in analyses:
-            cur.execute(
-                """
-                INSERT INTO ticket_analysis (analysis_run_id, ticket_id, category, priority, notes)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING id, analysis_run_id, ticket_id, category, priority, notes
-                """,
+    with get_conn() as conn, conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            """
+            INSERT INTO ticket_analysis (analysis_run_id, ticket_id, category, priority, notes)
+            VALUES %s
+            RETURNING id, analysis_run_id, ticket_id, category, priority, notes
+            """,
+            [
                 (
                     analysis.analysis_run_id,
                     analysis.ticket_id,
@@ -180,19 +238,69 @@ def bulk_insert_ticket_analysis(analyses: List[TicketAnalysisCreate]) -> List[Ti
                     analysis.priority,
                     analysis.notes,
                 )
-            )
-            row = cur.fetchone()
-            inserted.append(TicketAnalysis(**row))
-        
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cur.close()
-        conn.close()
+                for analysis in analyses
+            ],
+            page_size=1000,
+            fetch=True,
+        )
     
-    return inserted
+    return [TicketAnalysis.model_construct(**row) for row in rows]
+
+
+# ============================================================================
+# Classification Cache Operations
+# ============================================================================
+
+def get_cached_classifications(text_hashes: List[bytes]) -> Dict[bytes, TicketClassification]:
+    """Fetch cached classifications for the given ticket text hashes, keyed by hash"""
+    if not text_hashes:
+        return {}
+    
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT text_hash, category, priority, reasoning
+            FROM ticket_classification_cache
+            WHERE text_hash = ANY(%s)
+            """,
+            (list(set(text_hashes)),)
+        )
+        rows = cur.fetchall()
+    
+    return {
+        bytes(row["text_hash"]): TicketClassification.model_construct(
+            category=row["category"],
+            priority=row["priority"],
+            reasoning=row["reasoning"],
+        )
+        for row in rows
+    }
+
+
+def cache_classifications(classifications: Dict[bytes, TicketClassification]) -> None:
+    """Store classifications keyed by ticket text hash, keeping existing entries"""
+    if not classifications:
+        return
+    
+    with get_conn() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO ticket_classification_cache (text_hash, category, priority, reasoning)
+            VALUES %s
+            ON CONFLICT (text_hash) DO NOTHING
+            """,
+            [
+                (
+                    text_hash,
+                    classification.category,
+                    classification.priority,
+                    classification.reasoning,
+                )
+                for text_hash, classification in classifications.items()
+            ],
+            page_size=1000,
+        )
 
 
 # ============================================================================
@@ -204,30 +312,21 @@ def get_latest_analysis() -> Optional[LatestAnalysisResponse]:
     Get the most recent analysis run with all its ticket analyses.
     Returns None if no analysis runs exist.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # First, get the latest analysis run
-        cur.execute(
-            """
-            SELECT id, created_at, summary
-            FROM analysis_runs
-            ORDER BY created_at DESC
-            LIMIT 1
-            """
-        )
-        run_row = cur.fetchone()
-        
-        if not run_row:
-            return None
-        
-        analysis_run = AnalysisRun(**run_row)
-        
-        # Then get all ticket analyses for this run with ticket details
+    with get_conn() as conn, conn.cursor() as cur:
+        # Fetch the latest run and its ticket analyses in one round-trip.
+        # LEFT JOINs keep the run row even when it has no ticket analyses.
         cur.execute(
             """
-            SELECT 
+            WITH latest AS (
+                SELECT id, created_at, summary
+                FROM analysis_runs
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            )
+            SELECT
+                l.id AS run_id,
+                l.created_at AS run_created_at,
+                l.summary,
                 t.id,
                 t.title,
                 t.description,
@@ -235,23 +334,41 @@ def get_latest_analysis() -> Optional[LatestAnalysisResponse]:
                 ta.category,
                 ta.priority,
                 ta.notes
-            FROM ticket_analysis ta
-            JOIN tickets t ON ta.ticket_id = t.id
-            WHERE ta.analysis_run_id = %s
+            FROM latest l
+            LEFT JOIN ticket_analysis ta ON ta.analysis_run_id = l.id
+            LEFT JOIN tickets t ON ta.ticket_id = t.id
             ORDER BY t.created_at DESC
-            """,
-            (analysis_run.id,)
+            """
         )
-        ticket_rows = cur.fetchall()
-        
-        tickets = [TicketWithAnalysis(**row) for row in ticket_rows]
-        
-        return LatestAnalysisResponse(
-            analysis_run_id=analysis_run.id,
-            created_at=analysis_run.created_at,
-            summary=analysis_run.summary,
-            tickets=tickets,
+        rows = cur.fetchall()
+    
+    if not rows:
+        return None
+    
+    first = rows[0]
+    analysis_run = AnalysisRun.model_construct(
+        id=first["run_id"],
+        created_at=first["run_created_at"],
+        summary=first["summary"],
+    )
+    
+    tickets = [
+        TicketWithAnalysis.model_construct(
+            id=row["id"],
+            title=row["title"],
+            description=row["description"],
+            created_at=row["created_at"],
+            category=row["category"],
+            priority=row["priority"],
+            notes=row["notes"],
         )
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        for row in rows
+        if row["id"] is not None
+    ]
+    
+    return LatestAnalysisResponse(
+        analysis_run_id=analysis_run.id,
+        created_at=analysis_run.created_at,
+        summary=analysis_run.summary,
+        tickets=tickets,
+    )
\ No newline at end of file
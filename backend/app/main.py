@@ -1,13 +1,22 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.db import insert_tickets, get_all_tickets, get_latest_analysis
+from app.db import insert_tickets, get_all_tickets, get_latest_analysis, close_pool
 from app.models import TicketCreate, Ticket, LatestAnalysisResponse
 from app.agent import run_agent
 
-app = FastAPI(title="Support Ticket Analyst API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled database connections on shutdown
+    close_pool()
+
+
+app = FastAPI(title="Support Ticket Analyst API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -50,6 +50,17 @@ class TicketAnalysis(BaseModel):
     notes: Optional[str] = None
 
 
+# ============================================================================
+# Classification Schemas
+# ============================================================================
+
+class TicketClassification(BaseModel):
+    """Structured output from LLM for a single ticket"""
+    category: str  # billing, bug, feature_request, or general
+    priority: str  # high, medium, or low
+    reasoning: str  # Brief explanation of the classification
+
+
 # ============================================================================
 # Combined Response Schemas
 # ============================================================================
@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from app.config import settings
+from app.db import use_connection, insert_tickets, create_analysis_run
+from app.models import TicketCreate
+
+# Mounted at /db in the backend container (see docker-compose.yml)
+INIT_SQL = Path(__file__).resolve().parents[2] / "db" / "init.sql"
+
+
+def _use_worker_schema(conn, worker: str):
+    """
+    Point the connection at a private schema for this pytest-xdist worker and
+    create the tables there, so parallel workers never contend for the same rows.
+    """
+    schema = f"test_{worker}"
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+        cur.execute(INIT_SQL.read_text())
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--pg-container",
+        action="store_true",
+        default=False,
+        help="Run against a throwaway Postgres started with testcontainers instead of DATABASE_URL",
+    )
+
+
+@pytest.fixture(scope="session")
+def database_url(request):
+    """
+    DATABASE_URL by default. With --pg-container, a disposable Postgres started
+    through testcontainers and initialised from db/init.sql.
+    """
+    if not request.config.getoption("--pg-container"):
+        yield settings.DATABASE_URL
+        return
+    
+    postgres = pytest.importorskip("testcontainers.postgres")
+    with postgres.PostgresContainer("postgres:15", driver=None) as container:
+        url = container.get_connection_url()
+        conn = psycopg2.connect(url)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(INIT_SQL.read_text())
+            conn.commit()
+        finally:
+            conn.close()
+        
+        yield url
+
+
+@pytest.fixture(scope="session")
+def db_conn(database_url):
+    """
+    One connection for the whole test session, held in a single transaction
+    that is rolled back at the end so tests never leave rows behind.
+    Under pytest-xdist each worker also gets its own schema, dropped by the same rollback.
+    """
+    conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+    try:
+        worker = os.environ.get("PYTEST_XDIST_WORKER")
+        if worker:
+            _use_worker_schema(conn, worker)
+        
+        with use_connection(conn):
+            yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@pytest.fixture
+def db_tx(db_conn):
+    """Wrap each test in a SAVEPOINT that is rolled back on teardown"""
+    with db_conn.cursor() as cur:
+        cur.execute("SAVEPOINT test_case")
+    
+    yield
+    
+    with db_conn.cursor() as cur:
+        cur.execute("ROLLBACK TO SAVEPOINT test_case")
+        cur.execute("RELEASE SAVEPOINT test_case")
+
+
+@pytest.fixture(scope="module")
+def module_tx(db_conn):
+    """Wrap a module's shared fixtures in a SAVEPOINT that is rolled back when the module finishes"""
+    with db_conn.cursor() as cur:
+        cur.execute("SAVEPOINT test_module")
+    
+    yield
+    
+    with db_conn.cursor() as cur:
+        cur.execute("ROLLBACK TO SAVEPOINT test_module")
+        cur.execute("RELEASE SAVEPOINT test_module")
+
+
+@pytest.fixture(scope="module")
+def analysis_run(module_tx):
+    """
+    An analysis run created once per module and shared by every test that needs one.
+    Analyses added by tests roll back with each test's SAVEPOINT.
+    """
+    return create_analysis_run("Analysis: 1 billing issue, 1 bug found")
+
+
+@pytest.fixture(scope="module")
+def sample_tickets(module_tx):
+    """Two tickets created once per module (model_construct skips validation of these literals)"""
+    return insert_tickets([
+        TicketCreate.model_construct(title="Payment Failed", description="CC declined"),
+        TicketCreate.model_construct(title="UI Bug", description="Button not working"),
+    ])
+
+
+@pytest.fixture
+def clean_db(db_conn):
+    """
+    Empty every table for one test. TRUNCATE is a metadata-only operation rather
+    than a per-row DELETE, and it runs inside the test's SAVEPOINT, so the rows
+    come back when db_tx rolls back.
+    """
+    with db_conn.cursor() as cur:
+        cur.execute(
+            """
+            TRUNCATE tickets, analysis_runs, ticket_analysis, ticket_classification_cache
+            RESTART IDENTITY CASCADE
+            """
+        )
@@ -0,0 +1,184 @@
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from app import agent
+from app.models import AnalysisRun, Ticket, TicketClassification
+
+
+def make_ticket(ticket_id, title=None, description=None):
+    return Ticket(
+        id=ticket_id,
+        title=title or f"Ticket {ticket_id}",
+        description=description or f"Description {ticket_id}",
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+def make_classification(ticket_id):
+    return TicketClassification(category="bug", priority="high", reasoning=f"Reason {ticket_id}")
+
+
+@pytest.fixture(autouse=True)
+def openai_key(monkeypatch):
+    """AsyncOpenAI refuses to start without an API key; no request is ever sent"""
+    monkeypatch.setattr(agent.settings, "OPENAI_API_KEY", "test-key")
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    """Replace the database and LLM calls used by the graph nodes; returns what was saved"""
+    tickets = [make_ticket(1), make_ticket(2)]
+    saved = {}
+    
+    async def classify_tickets(batch):
+        return [make_classification(t.id) for t in batch]
+    
+    def create_run(summary):
+        saved["summary"] = summary
+        return AnalysisRun.model_construct(id=7, created_at=datetime(2024, 1, 1), summary=summary)
+    
+    def bulk_insert(analyses):
+        saved["analyses"] = [(a.analysis_run_id, a.ticket_id) for a in analyses]
+        return []
+    
+    monkeypatch.setattr(agent, "get_all_tickets", lambda: list(tickets))
+    monkeypatch.setattr(agent, "get_cached_classifications", lambda hashes: {})
+    monkeypatch.setattr(agent, "cache_classifications", lambda classifications: None)
+    monkeypatch.setattr(agent, "classify_tickets_with_llm", classify_tickets)
+    monkeypatch.setattr(agent, "create_analysis_run", create_run)
+    monkeypatch.setattr(agent, "bulk_insert_ticket_analysis", bulk_insert)
+    return saved
+
+
+def test_classify_tickets_retries_dropped_ticket(monkeypatch):
+    """Test a ticket the model drops from a batch is requested again and recovered"""
+    tickets = [make_ticket(1), make_ticket(2), make_ticket(3)]
+    calls = []
+    
+    async def classify_batch(client, batch):
+        calls.append([t.id for t in batch])
+        # Drop ticket 2 the first time it is requested
+        return {
+            t.id: make_classification(t.id)
+            for t in batch
+            if t.id != 2 or len(calls) > 1
+        }
+    
+    monkeypatch.setattr(agent, "classify_ticket_batch_with_llm", classify_batch)
+    
+    result = asyncio.run(agent.classify_tickets_with_llm(tickets))
+    
+    assert calls == [[1, 2, 3], [2]]
+    assert [c.reasoning for c in result] == ["Reason 1", "Reason 2", "Reason 3"]
+
+
+def test_classify_tickets_raises_when_ticket_stays_missing(monkeypatch):
+    """Test a ticket dropped on the retry as well fails the run"""
+    tickets = [make_ticket(1), make_ticket(2)]
+    
+    async def classify_batch(client, batch):
+        return {t.id: make_classification(t.id) for t in batch if t.id != 2}
+    
+    monkeypatch.setattr(agent, "classify_ticket_batch_with_llm", classify_batch)
+    
+    with pytest.raises(ValueError, match=r"\[2\]"):
+        asyncio.run(agent.classify_tickets_with_llm(tickets))
+
+
+def test_classify_batch_ignores_unrequested_ids():
+    """Test classifications for ticket IDs that were not in the batch are dropped"""
+    tickets = [make_ticket(1), make_ticket(2)]
+    content = json.dumps({
+        "classifications": [
+            {"ticket_id": ticket_id, "category": "bug", "priority": "high", "reasoning": "r"}
+            for ticket_id in (1, 2, 99)
+        ]
+    })
+    
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    
+    result = asyncio.run(agent.classify_ticket_batch_with_llm(client, tickets))
+    
+    assert set(result) == {1, 2}
+
+
+def test_analyze_tickets_classifies_duplicate_text_once(monkeypatch):
+    """Test tickets sharing a title and description are classified once and each get an analysis"""
+    tickets = [
+        make_ticket(1, "Login broken", "Cannot sign in"),
+        make_ticket(2, "Login broken", "Cannot sign in"),
+    ]
+    classified = []
+    cached = {}
+    
+    async def classify_tickets(batch):
+        classified.append([t.id for t in batch])
+        return [make_classification(t.id) for t in batch]
+    
+    monkeypatch.setattr(agent, "get_cached_classifications", lambda hashes: {})
+    monkeypatch.setattr(agent, "cache_classifications", cached.update)
+    monkeypatch.setattr(agent, "classify_tickets_with_llm", classify_tickets)
+    
+    result = agent.analyze_tickets_node({"tickets": tickets})
+    
+    assert classified == [[1]]
+    assert len(cached) == 1
+    assert [a.ticket_id for a in result["analyses"]] == [1, 2]
+    assert {(a.category, a.priority, a.notes) for a in result["analyses"]} == {("bug", "high", "Reason 1")}
+
+
+def test_analysis_graph_runs_every_node(stub_pipeline):
+    """Test the compiled graph fetches, analyzes and saves, returning the merged state"""
+    final_state = agent.analysis_graph.invoke({
+        "ticket_ids": None,
+        "tickets": [],
+        "run_id": None,
+        "summary": "",
+        "analyses": [],
+    })
+    
+    assert final_state["run_id"] == 7
+    assert final_state["summary"] == stub_pipeline["summary"]
+    assert final_state["summary"].startswith("Analyzed 2 ticket(s).")
+    assert [t.id for t in final_state["tickets"]] == [1, 2]
+    assert [a.ticket_id for a in final_state["analyses"]] == [1, 2]
+    assert stub_pipeline["analyses"] == [(7, 1), (7, 2)]
+
+
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_run_agent_fast_path_matches_graph(stub_pipeline, monkeypatch, fast_path):
+    """Test run_agent returns the same result with and without AGENT_FAST_PATH"""
+    monkeypatch.setattr(agent.settings, "AGENT_FAST_PATH", fast_path)
+    
+    result = agent.run_agent()
+    
+    assert result == {
+        "run_id": 7,
+        "summary": stub_pipeline["summary"],
+        "ticket_count": 2,
+    }
+    assert stub_pipeline["analyses"] == [(7, 1), (7, 2)]
+
+
+def test_classify_tickets_raises_batch_error_unchained(monkeypatch):
+    """Test a failing batch surfaces its own exception, not the TaskGroup's ExceptionGroup"""
+    monkeypatch.setattr(agent.settings, "LLM_BATCH_SIZE", 1)
+    
+    async def classify_batch(client, batch):
+        if batch[0].id == 2:
+            raise RuntimeError("rate limited")
+        await asyncio.sleep(0)
+        return {t.id: make_classification(t.id) for t in batch}
+    
+    monkeypatch.setattr(agent, "classify_ticket_batch_with_llm", classify_batch)
+    
+    with pytest.raises(RuntimeError, match="rate limited") as excinfo:
+        asyncio.run(agent.classify_tickets_with_llm([make_ticket(1), make_ticket(2)]))
+    
+    assert excinfo.value.__suppress_context__
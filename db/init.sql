@@ -23,9 +23,20 @@ CREATE TABLE IF NOT EXISTS ticket_analysis (
     notes TEXT
 );
 
+-- Classifications keyed by a hash of ticket title + description, reused across runs
+CREATE TABLE IF NOT EXISTS ticket_classification_cache (
+    text_hash BYTEA PRIMARY KEY,
+    category TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    reasoning TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create indexes for better query performance
 CREATE INDEX idx_ticket_analysis_run ON ticket_analysis(analysis_run_id);
 CREATE INDEX idx_ticket_analysis_ticket ON ticket_analysis(ticket_id);
+-- Lets "latest run" lookups read a single index entry
+CREATE INDEX idx_analysis_runs_created_at ON analysis_runs(created_at DESC, id DESC);
 
 -- Insert some sample tickets for testing
 INSERT INTO tickets (title, description) VALUES
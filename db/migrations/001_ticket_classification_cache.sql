@@ -0,0 +1,10 @@
+-- db/migrations/001_ticket_classification_cache.sql
+-- Adds the LLM classification cache to databases created before it existed in init.sql
+
+CREATE TABLE IF NOT EXISTS ticket_classification_cache (
+    text_hash BYTEA PRIMARY KEY,
+    category TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    reasoning TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
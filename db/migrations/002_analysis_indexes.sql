@@ -0,0 +1,5 @@
+-- db/migrations/002_analysis_indexes.sql
+-- Index for the latest-run lookup in get_latest_analysis.
+-- CONCURRENTLY avoids blocking writes; run outside a transaction block (plain psql does).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analysis_runs_created_at ON analysis_runs(created_at DESC, id DESC);